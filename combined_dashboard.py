@@ -3,112 +3,40 @@
 Daily Enrollment Dashboard Updater
 Combines sync log monitoring with database analytics
 """
+import asyncio
 import os
 import sys
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 import configparser
+import functools
 import json
+from heapq import nlargest
+from html import escape
+from operator import itemgetter
 
 # Import our modules
 from enrollment_monitor import EnrollmentMonitor
 from enrollment_analytics import EnrollmentAnalytics
 
-class CombinedDashboard:
-    def __init__(self, config_file='config.ini'):
-        self.config_file = Path(config_file)
-        self.db_config = self.load_db_config()
+@functools.lru_cache(maxsize=4)
+def _read_mssql_section(path, mtime):
+    """Parse the [MSSQL] section of a config file, cached per (path, mtime)"""
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    if 'MSSQL' not in parser:
+        return {}
+    return dict(parser['MSSQL'])
 
-        # Initialize components
-        self.monitor = EnrollmentMonitor()
-        self.analytics = EnrollmentAnalytics(
-            server=self.db_config.get('server'),
-            database=self.db_config.get('database'),
-            username=self.db_config.get('username'),
-            password=self.db_config.get('password')
-        )
+# Separator between timestamp, level and message in sync log lines
+_SEP = ' - '
 
-    def load_db_config(self):
-        """Load database configuration"""
-        config = {
-            'server': os.getenv('MSSQL_SERVER', 'localhost'),
-            'database': os.getenv('MSSQL_DATABASE', 'moodle'),
-            'username': os.getenv('MSSQL_USERNAME', 'sa'),
-            'password': os.getenv('MSSQL_PASSWORD', '')
-        }
-
-        if self.config_file.exists():
-            try:
-                parser = configparser.ConfigParser()
-                parser.read(self.config_file)
-
-                if 'MSSQL' in parser:
-                    config.update({
-                        'server': parser['MSSQL'].get('server', config['server']),
-                        'database': parser['MSSQL'].get('database', config['database']),
-                        'username': parser['MSSQL'].get('username', config['username']),
-                        'password': parser['MSSQL'].get('password', config['password'])
-                    })
-            except Exception as e:
-                print(f"Warning: Could not load config file: {e}")
-
-        return config
-
-    def generate_combined_dashboard(self):
-        """Generate dashboard with both sync log and database data"""
-        print("🔄 Generating combined enrollment dashboard...")
-
-        # Get sync log metrics
-        log_metrics = self.monitor.parse_log_file(self.monitor.log_file)
-
-        # Get database analytics
-        db_connected = self.analytics.connect()
-        db_metrics = {}
-
-        if db_connected:
-            try:
-                # Get daily enrollment counts
-                daily_counts = self.analytics.get_daily_enrollments(30)
-                db_metrics['daily_enrollments'] = daily_counts
-
-                # Get enrollment trends
-                trends = self.analytics.get_enrollment_trends(7)
-                db_metrics['trends'] = trends
-
-                # Get today's course enrollments
-                today_courses = self.analytics.get_course_enrollments_by_date()
-                db_metrics['today_courses'] = today_courses
-
-                # Calculate summary stats
-                if daily_counts:
-                    total_30_days = sum(day['count'] for day in daily_counts)
-                    db_metrics['total_30_days'] = total_30_days
-                    db_metrics['avg_daily'] = round(total_30_days / len(daily_counts), 1)
+# Reuse cached metrics for this long before forcing a full refresh
+DASHBOARD_CACHE_TTL = 60  # seconds
 
-                print("✅ Database analytics retrieved successfully")
-            except Exception as e:
-                print(f"❌ Database analytics failed: {e}")
-                db_metrics = {'error': str(e)}
-            finally:
-                self.analytics.close()
-        else:
-            print("⚠️  Database connection failed - dashboard will show sync log data only")
-            db_metrics = {'error': 'Database connection failed'}
-
-        # Generate enhanced HTML
-        html_content = self.generate_enhanced_html(log_metrics, db_metrics)
-
-        # Save dashboard
-        dashboard_file = Path('index.html')
-        with open(dashboard_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-
-        print(f"✅ Combined dashboard generated: {dashboard_file}")
-        return True
-
-    def generate_enhanced_html(self, log_metrics, db_metrics):
-        """Generate HTML with both sync log and database data"""
-        html = f"""<!DOCTYPE html>
+# Static page skeleton shared by every render; only the timestamps vary
+_HTML_HEAD_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -131,19 +59,22 @@ class CombinedDashboard:
         <div class="row">
             <div class="col-12">
                 <h1 class="text-center mb-4">Moodle Enrollment Sync Monitor</h1>
-                <p class="text-center text-muted">Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                <!-- Force redeploy: {datetime.now().strftime('%Y%m%d%H%M%S')} -->
+                <p class="text-center text-muted">Last updated: {last_updated}</p>
+                <!-- Force redeploy: {redeploy_tag} -->
             </div>
-        </div>
+        </div>"""
+
+# Status banner and headline metric cards, filled in per render
+_METRICS_TEMPLATE = """
 
         <!-- Database Status -->
         <div class="row mb-4">
             <div class="col-12">
-                <div class="card {'bg-success text-white' if 'error' not in db_metrics else 'bg-warning text-dark'}">
+                <div class="card {status_class}">
                     <div class="card-body text-center">
                         <h5>Database Connection Status</h5>
                         <p class="mb-0">
-                            {'✅ Connected - Real-time enrollment data available' if 'error' not in db_metrics else f'⚠️  Disconnected - {db_metrics.get("error", "Unknown error")}'}
+                            {status_message}
                         </p>
                     </div>
                 </div>
@@ -156,7 +87,7 @@ class CombinedDashboard:
                 <div class="card metric-card sync-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">Last Sync</h5>
-                        <p class="card-text h4">{log_metrics['last_run'] or 'N/A'}</p>
+                        <p class="card-text h4">{last_run}</p>
                         <small class="text-muted">From sync logs</small>
                     </div>
                 </div>
@@ -165,7 +96,7 @@ class CombinedDashboard:
                 <div class="card metric-card sync-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">Sync Records</h5>
-                        <p class="card-text h4">{log_metrics['total_records']}</p>
+                        <p class="card-text h4">{total_records}</p>
                         <small class="text-muted">Processed in sync</small>
                     </div>
                 </div>
@@ -174,7 +105,7 @@ class CombinedDashboard:
                 <div class="card metric-card db-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">30-Day Total</h5>
-                        <p class="card-text h4 status-healthy">{db_metrics.get('total_30_days', 'N/A')}</p>
+                        <p class="card-text h4 status-healthy">{total_30_days}</p>
                         <small class="text-muted">From database</small>
                     </div>
                 </div>
@@ -183,7 +114,7 @@ class CombinedDashboard:
                 <div class="card metric-card db-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">Daily Average</h5>
-                        <p class="card-text h4 status-healthy">{db_metrics.get('avg_daily', 'N/A')}</p>
+                        <p class="card-text h4 status-healthy">{avg_daily}</p>
                         <small class="text-muted">Last 30 days</small>
                     </div>
                 </div>
@@ -196,7 +127,7 @@ class CombinedDashboard:
                 <div class="card metric-card sync-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">Sync Success</h5>
-                        <p class="card-text h4 status-healthy">{log_metrics['successful']}</p>
+                        <p class="card-text h4 status-healthy">{successful}</p>
                         <small class="text-muted">From sync logs</small>
                     </div>
                 </div>
@@ -205,7 +136,7 @@ class CombinedDashboard:
                 <div class="card metric-card sync-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">Sync Errors</h5>
-                        <p class="card-text h4 status-error">{log_metrics['errors']}</p>
+                        <p class="card-text h4 status-error">{errors}</p>
                         <small class="text-muted">From sync logs</small>
                     </div>
                 </div>
@@ -214,7 +145,7 @@ class CombinedDashboard:
                 <div class="card metric-card sync-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">API Errors</h5>
-                        <p class="card-text h4 status-error">{log_metrics['api_errors']}</p>
+                        <p class="card-text h4 status-error">{api_errors}</p>
                         <small class="text-muted">Moodle API issues</small>
                     </div>
                 </div>
@@ -223,22 +154,43 @@ class CombinedDashboard:
                 <div class="card metric-card sync-section">
                     <div class="card-body text-center">
                         <h5 class="card-title">User Creation Failed</h5>
-                        <p class="card-text h4 status-error">{log_metrics['user_creation_failed']}</p>
+                        <p class="card-text h4 status-error">{user_creation_failed}</p>
                         <small class="text-muted">Account issues</small>
                     </div>
                 </div>
             </div>
         </div>"""
 
-        # Add database analytics sections if available
-        if 'error' not in db_metrics:
-            html += self.generate_database_sections(db_metrics)
+# Per-row fragments, parsed once and reused for every row
+_DAY_ROW = '''
+                        <div class="d-flex justify-content-between align-items-center mb-2">
+                            <span>{date}</span>
+                            <span class="badge bg-primary">{count}</span>
+                        </div>'''
 
-        # Add sync log sections
-        html += self.generate_sync_sections(log_metrics)
+_COURSE_ROW = '''
+                        <div class="d-flex justify-content-between align-items-center mb-2">
+                            <span class="text-truncate" style="max-width: 70%;">{code}</span>
+                            <span class="badge bg-success">{count}</span>
+                        </div>'''
 
-        # Close HTML
-        html += """
+_BREAKDOWN_ROW = '''
+                        <div class="d-flex justify-content-between align-items-center mb-2">
+                            <span>{label}</span>
+                            <span class="badge bg-{color}">{count}</span>
+                        </div>
+                        '''
+
+_BATCH_ROW = '''
+                            <div class="d-flex justify-content-between align-items-center mb-2">
+                                <span>Batch {batch} ({count} records)</span>
+                                <span class="badge bg-success">{status}</span>
+                            </div>
+                            '''
+
+_LOG_ENTRY_ROW = "<p class='mb-1 small text-truncate'>{text}</p>"
+
+_HTML_TAIL = """
         <div class="row">
             <div class="col-12">
                 <div class="card">
@@ -254,15 +206,198 @@ class CombinedDashboard:
 </body>
 </html>"""
 
-        return html
+class CombinedDashboard:
+    def __init__(self, config_file='config.ini'):
+        self.config_file = Path(config_file)
+        self.db_config = self.load_db_config()
+        self._cache_path = Path('.dashboard_cache.json')
 
-    def generate_database_sections(self, db_metrics):
-        """Generate HTML sections for database analytics"""
-        html = ""
+        # Initialize components
+        self.monitor = EnrollmentMonitor()
+        self.analytics = EnrollmentAnalytics(
+            server=self.db_config.get('server'),
+            database=self.db_config.get('database'),
+            username=self.db_config.get('username'),
+            password=self.db_config.get('password')
+        )
+
+    def load_db_config(self):
+        """Load database configuration"""
+        config = {
+            'server': os.getenv('MSSQL_SERVER', 'localhost'),
+            'database': os.getenv('MSSQL_DATABASE', 'moodle'),
+            'username': os.getenv('MSSQL_USERNAME', 'sa'),
+            'password': os.getenv('MSSQL_PASSWORD', '')
+        }
+
+        if self.config_file.exists():
+            try:
+                section = _read_mssql_section(str(self.config_file), self.config_file.stat().st_mtime)
+                config.update({key: section.get(key, default) for key, default in config.items()})
+            except Exception as e:
+                print(f"Warning: Could not load config file: {e}")
+
+        return config
+
+    def generate_combined_dashboard(self):
+        """Generate dashboard with both sync log and database data"""
+        return asyncio.run(self.generate_combined_dashboard_async())
+
+    async def generate_combined_dashboard_async(self):
+        """Generate the dashboard, overlapping log parsing with the database queries"""
+        print("🔄 Generating combined enrollment dashboard...")
+
+        # One clock read per run, shared by the cache key, the queries and the page
+        now = datetime.now()
+        now_human = now.strftime('%Y-%m-%d %H:%M:%S')
+        now_tag = now.strftime('%Y%m%d%H%M%S')
+        today = now.date().isoformat()
+
+        dashboard_file = Path('index.html')
+        log_file = Path(self.monitor.log_file)
+        log_mtime = log_file.stat().st_mtime if log_file.exists() else None
+
+        # Within the TTL only refresh the inputs that changed: a new log
+        # mtime re-parses the log, a date rollover (or a previous DB
+        # failure) re-queries the database.
+        cache = self.load_cache()
+        fresh = bool(cache) and time.time() - cache['generated_at'] < DASHBOARD_CACHE_TTL
+        log_dirty = not fresh or cache['log_mtime'] != log_mtime
+        db_dirty = not fresh or cache['date'] != today or 'error' in cache['db_metrics']
+
+        if not log_dirty and not db_dirty and dashboard_file.exists():
+            print(f"✅ Dashboard unchanged since last run, keeping {dashboard_file}")
+            return True
+
+        # Log parsing is local I/O and the analytics batch is network-bound,
+        # so run them side by side. Only the analytics thread touches the
+        # pyodbc connection.
+        pending = {}
+        if log_dirty:
+            pending['log'] = asyncio.to_thread(self.monitor.parse_log_file, self.monitor.log_file)
+        if db_dirty:
+            pending['db'] = asyncio.to_thread(self.collect_db_metrics, now.date())
+        results = dict(zip(pending, await asyncio.gather(*pending.values())))
+
+        log_metrics = results['log'] if log_dirty else cache['log_metrics']
+        db_metrics = results['db'] if db_dirty else cache['db_metrics']
+
+        # Stream enhanced HTML into a temp file and swap it in only once the
+        # page is complete, so a failed render never leaves a truncated dashboard
+        tmp_file = dashboard_file.with_name(dashboard_file.name + '.tmp')
+        try:
+            with open(tmp_file, 'w', encoding='utf-8', buffering=65536) as f:
+                f.writelines(self.iter_enhanced_html(log_metrics, db_metrics, now_human, now_tag))
+                f.write(self.monitor.timings_comment())
+            os.replace(tmp_file, dashboard_file)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+
+        self.save_cache({
+            'generated_at': time.time(),
+            'log_mtime': log_mtime,
+            'date': today,
+            'log_metrics': log_metrics,
+            'db_metrics': db_metrics
+        })
+
+        print(f"✅ Combined dashboard generated: {dashboard_file}")
+        return True
+
+    def load_cache(self):
+        """Load the previous run's metrics, or None if unavailable"""
+        try:
+            with open(self._cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_cache(self, cache):
+        """Atomically write the metrics cache"""
+        tmp_path = self._cache_path.with_name(self._cache_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # Dates from the database become ISO strings, which render identically
+                f.write(json.dumps(cache, default=str, separators=(',', ':')))
+            os.replace(tmp_path, self._cache_path)
+        except (OSError, TypeError) as e:
+            print(f"Warning: Could not write dashboard cache: {e}")
+
+    def collect_db_metrics(self, target_date=None):
+        """Query database analytics for the dashboard"""
+        query = {'days_daily': 30, 'days_trends': 7, 'target_date': target_date}
+        # A result still in the analytics cache needs no connection at all
+        batch = self.analytics.cached('get_all_dashboard_metrics', **query)
+        db_connected = batch is not None or self.analytics.connect()
+        db_metrics = {}
+
+        if db_connected:
+            try:
+                # Daily counts, trends and today's courses in one round-trip
+                if batch is None:
+                    batch = self.analytics.get_all_dashboard_metrics(**query)
+                # Copy: the analytics result may be a cached object shared between runs
+                db_metrics = dict(batch)
+                daily_counts = db_metrics['daily_enrollments']
+
+                # Calculate summary stats
+                if daily_counts:
+                    total_30_days = sum(day['count'] for day in daily_counts)
+                    db_metrics['total_30_days'] = total_30_days
+                    db_metrics['avg_daily'] = round(total_30_days / len(daily_counts), 1)
+
+                print("✅ Database analytics retrieved successfully")
+            except Exception as e:
+                print(f"❌ Database analytics failed: {e}")
+                db_metrics = {'error': str(e)}
+            finally:
+                self.analytics.close()
+        else:
+            print("⚠️  Database connection failed - dashboard will show sync log data only")
+            db_metrics = {'error': 'Database connection failed'}
+
+        return db_metrics
+
+    def iter_enhanced_html(self, log_metrics, db_metrics, now_human, now_tag):
+        """Yield HTML chunks with both sync log and database data"""
+        yield _HTML_HEAD_TEMPLATE.format(last_updated=now_human, redeploy_tag=now_tag)
+
+        if 'error' not in db_metrics:
+            status_class = 'bg-success text-white'
+            status_message = '✅ Connected - Real-time enrollment data available'
+        else:
+            status_class = 'bg-warning text-dark'
+            status_message = f'⚠️  Disconnected - {escape(str(db_metrics.get("error", "Unknown error")))}'
+
+        yield _METRICS_TEMPLATE.format(
+            status_class=status_class,
+            status_message=status_message,
+            last_run=log_metrics['last_run'] or 'N/A',
+            total_records=log_metrics['total_records'],
+            total_30_days=db_metrics.get('total_30_days', 'N/A'),
+            avg_daily=db_metrics.get('avg_daily', 'N/A'),
+            successful=log_metrics['successful'],
+            errors=log_metrics['errors'],
+            api_errors=log_metrics['api_errors'],
+            user_creation_failed=log_metrics['user_creation_failed'],
+        )
+
+        # Add database analytics sections if available
+        if 'error' not in db_metrics:
+            yield from self.iter_database_sections(db_metrics)
 
+        # Add sync log sections
+        yield from self.iter_sync_sections(log_metrics)
+
+        # Close HTML
+        yield _HTML_TAIL
+
+    def iter_database_sections(self, db_metrics):
+        """Yield HTML sections for database analytics"""
         # Daily Enrollment Chart
         if 'daily_enrollments' in db_metrics and db_metrics['daily_enrollments']:
-            html += """
+            yield """
         <div class="row mb-4">
             <div class="col-md-6">
                 <div class="card db-section">
@@ -273,14 +408,13 @@ class CombinedDashboard:
                         <div style="max-height: 300px; overflow-y: auto;">
             """
 
-            for day in db_metrics['daily_enrollments'][:14]:  # Show last 14 days
-                html += f'''
-                        <div class="d-flex justify-content-between align-items-center mb-2">
-                            <span>{day['date']}</span>
-                            <span class="badge bg-primary">{day['count']}</span>
-                        </div>'''
+            # Show last 14 days
+            yield "".join(
+                _DAY_ROW.format(date=day['date'], count=day['count'])
+                for day in db_metrics['daily_enrollments'][:14]
+            )
 
-            html += """
+            yield """
                         </div>
                     </div>
                 </div>
@@ -289,7 +423,7 @@ class CombinedDashboard:
 
         # Today's Course Enrollments
         if 'today_courses' in db_metrics and db_metrics['today_courses']:
-            html += """
+            yield """
             <div class="col-md-6">
                 <div class="card db-section">
                     <div class="card-header">
@@ -299,14 +433,13 @@ class CombinedDashboard:
                         <div style="max-height: 300px; overflow-y: auto;">
             """
 
-            for course in db_metrics['today_courses'][:10]:  # Show top 10
-                html += f'''
-                        <div class="d-flex justify-content-between align-items-center mb-2">
-                            <span class="text-truncate" style="max-width: 70%;">{course['course_code']}</span>
-                            <span class="badge bg-success">{course['enrollments']}</span>
-                        </div>'''
+            # Show top 10
+            yield "".join(
+                _COURSE_ROW.format(code=escape(str(course['course_code'])), count=course['enrollments'])
+                for course in db_metrics['today_courses'][:10]
+            )
 
-            html += """
+            yield """
                         </div>
                     </div>
                 </div>
@@ -314,11 +447,10 @@ class CombinedDashboard:
         </div>
             """
 
-        return html
 
-    def generate_sync_sections(self, log_metrics):
-        """Generate HTML sections for sync log data"""
-        html = f"""
+    def iter_sync_sections(self, log_metrics):
+        """Yield HTML sections for sync log data"""
+        yield """
         <!-- Faculty and Department Breakdowns -->
         <div class="row mb-4">
             <div class="col-md-6">
@@ -327,12 +459,15 @@ class CombinedDashboard:
                         <h5>🏫 Faculty Breakdown</h5>
                     </div>
                     <div class="card-body">
-                        {"".join(f'''
-                        <div class="d-flex justify-content-between align-items-center mb-2">
-                            <span>{faculty}</span>
-                            <span class="badge bg-primary">{count}</span>
-                        </div>
-                        ''' for faculty, count in sorted(log_metrics['faculty_breakdown'].items(), key=lambda x: x[1], reverse=True))}
+                        """
+
+        faculty_breakdown = log_metrics['faculty_breakdown']
+        yield "".join(
+            _BREAKDOWN_ROW.format(label=escape(faculty), count=count, color='primary')
+            for faculty, count in nlargest(len(faculty_breakdown), faculty_breakdown.items(), key=itemgetter(1))
+        )
+
+        yield """
                     </div>
                 </div>
             </div>
@@ -342,12 +477,14 @@ class CombinedDashboard:
                         <h5>📋 Department Codes</h5>
                     </div>
                     <div class="card-body">
-                        {"".join(f'''
-                        <div class="d-flex justify-content-between align-items-center mb-2">
-                            <span>{dept}</span>
-                            <span class="badge bg-info">{count}</span>
-                        </div>
-                        ''' for dept, count in sorted(log_metrics['department_breakdown'].items(), key=lambda x: x[1], reverse=True)[:20])}
+                        """
+
+        yield "".join(
+            _BREAKDOWN_ROW.format(label=escape(dept), count=count, color='info')
+            for dept, count in nlargest(20, log_metrics['department_breakdown'].items(), key=itemgetter(1))
+        )
+
+        yield """
                     </div>
                 </div>
             </div>
@@ -362,12 +499,14 @@ class CombinedDashboard:
                     </div>
                     <div class="card-body">
                         <div style="max-height: 250px; overflow-y: auto;">
-                            {"".join(f'''
-                            <div class="d-flex justify-content-between align-items-center mb-2">
-                                <span>Batch {batch['batch']} ({batch['count']} records)</span>
-                                <span class="badge bg-success">{batch['status']}</span>
-                            </div>
-                            ''' for batch in log_metrics['batch_info'][-8:])}
+                            """
+
+        yield "".join(
+            _BATCH_ROW.format(batch=batch['batch'], count=batch['count'], status=escape(batch['status']))
+            for batch in log_metrics['batch_info'][-8:]
+        )
+
+        yield """
                         </div>
                     </div>
                 </div>
@@ -379,19 +518,25 @@ class CombinedDashboard:
                     </div>
                     <div class="card-body">
                         <div style="max-height: 250px; overflow-y: auto;">
-                            {"".join(f"<p class='mb-1 small text-truncate'>{entry.split(' - ', 2)[-1] if ' - ' in entry else entry}</p>" for entry in log_metrics['recent_entries'][-15:])}
+                            """
+
+        # split() returns [entry] when there is no separator, so no membership pre-check is needed
+        yield "".join(
+            _LOG_ENTRY_ROW.format(text=escape(entry.split(_SEP, 2)[-1]))
+            for entry in log_metrics['recent_entries'][-15:]
+        )
+
+        yield """
                         </div>
                     </div>
                 </div>
             </div>
         </div>"""
 
-        return html
-
 def main():
     dashboard = CombinedDashboard()
 
-    if dashboard.generate_combined_dashboard():
+    if asyncio.run(dashboard.generate_combined_dashboard_async()):
         print("✅ Combined dashboard generated successfully!")
     else:
         print("❌ Failed to generate dashboard")
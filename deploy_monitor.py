@@ -8,15 +8,25 @@ import subprocess
 import sys
 from pathlib import Path
 
-def run_command(command, cwd=None):
-    """Run a shell command and return success."""
+def run_command(argv, cwd=None, capture=False):
+    """Run a command (argv list, no shell) and return success and output.
+
+    stdout is only piped back when capture is set; otherwise it is discarded.
+    """
     try:
-        result = subprocess.run(command, shell=True, cwd=cwd, check=True, capture_output=True, text=True)
-        return True, result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"Command failed: {command}")
-        print(f"Error: {e.stderr}")
-        return False, e.stderr
+        result = subprocess.run(argv, cwd=cwd, text=True,
+                                stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+    except OSError as e:
+        print(f"Command failed: {' '.join(argv)}")
+        print(f"Error: {e}")
+        return False, str(e)
+
+    if result.returncode != 0:
+        print(f"Command failed: {' '.join(argv)}")
+        print(f"Error: {result.stderr}")
+        return False, result.stderr
+    return True, result.stdout or ''
 
 def setup_github_repo(repo_url, site_dir='monitoring_site'):
     """Setup GitHub repo for the monitoring site."""
@@ -31,23 +41,23 @@ def setup_github_repo(repo_url, site_dir='monitoring_site'):
     # Initialize git repo if not already
     if not (site_path / '.git').exists():
         print("Initializing git repository...")
-        success, _ = run_command("git init")
+        success, _ = run_command(["git", "init"])
         if not success:
             return False
 
-        success, _ = run_command("git add .")
+        success, _ = run_command(["git", "add", "."])
         if not success:
             return False
 
-        success, _ = run_command('git commit -m "Initial enrollment monitor dashboard"')
+        success, _ = run_command(["git", "commit", "-m", "Initial enrollment monitor dashboard"])
         if not success:
             return False
 
     # Add remote if not exists
-    success, output = run_command("git remote -v")
+    success, output = run_command(["git", "remote", "-v"], capture=True)
     if 'origin' not in output:
         print(f"Adding remote origin: {repo_url}")
-        success, _ = run_command(f"git remote add origin {repo_url}")
+        success, _ = run_command(["git", "remote", "add", "origin", repo_url])
         if not success:
             return False
     else:
@@ -55,10 +65,10 @@ def setup_github_repo(repo_url, site_dir='monitoring_site'):
 
     # Push to GitHub
     print("Pushing to GitHub...")
-    success, _ = run_command("git push -u origin main")
+    success, _ = run_command(["git", "push", "-u", "origin", "main"])
     if not success:
         # Try master branch
-        success, _ = run_command("git push -u origin master")
+        success, _ = run_command(["git", "push", "-u", "origin", "master"])
         if not success:
             return False
 
@@ -74,24 +84,21 @@ def update_and_push(site_dir='.'):
 
     os.chdir(site_path)
 
-    # Add all changes
-    success, _ = run_command("git add .")
+    # Check if any tracked file (e.g. index.html) changed
+    success, output = run_command(["git", "status", "--porcelain", "--untracked-files=no"], capture=True)
     if not success:
         return False
-
-    # Check if there are changes
-    success, output = run_command("git status --porcelain")
     if not output.strip():
         print("No changes to commit")
         return True
 
-    # Commit changes
-    success, _ = run_command('git commit -m "Update enrollment monitor dashboard"')
+    # Stage and commit tracked changes in one step
+    success, _ = run_command(["git", "commit", "-am", "Update enrollment monitor dashboard"])
     if not success:
         return False
 
     # Push changes
-    success, _ = run_command("git push")
+    success, _ = run_command(["git", "push"])
     if not success:
         return False
 
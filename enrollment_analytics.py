@@ -6,15 +6,167 @@ Queries MSSQL database for day-by-day enrollment counts
 import pyodbc
 import pandas as pd
 from datetime import datetime, timedelta
+import functools
 import os
+import sys
+import time
 from pathlib import Path
 
+# ODBC connection pooling is pyodbc's default; stated explicitly because close()
+# relies on it to return connections to the pool (only read before the first connect)
+pyodbc.pooling = True
+
+# Seconds a successful query result is reused by the same EnrollmentAnalytics
+QUERY_CACHE_TTL = 30
+
+def _query_key(method_name, args, kwargs):
+    """Cache key for one call of a query method"""
+    return (method_name, args, tuple(sorted(kwargs.items())))
+
+def _cached_query(error_message, default):
+    """Memoize a query method on its instance for QUERY_CACHE_TTL seconds.
+
+    Only successful results are cached: if the query raises, error_message is
+    printed and a fresh default() is returned, so the next call retries.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapped(self, *args, **kwargs):
+            hit = self.cached(fn.__name__, *args, **kwargs)
+            if hit is not None:
+                return hit
+            try:
+                value = fn(self, *args, **kwargs)
+            except Exception as e:
+                print(f"{error_message}: {e}")
+                return default()
+            self._query_cache[_query_key(fn.__name__, args, kwargs)] = (time.monotonic(), value)
+            return value
+        return wrapped
+    return decorator
+
+DAILY_ENROLLMENTS_SQL = """
+    SELECT
+        CAST(DATEADD(DAY, DATEDIFF(DAY, 0, timecreated), 0) AS DATE) as enrollment_date,
+        COUNT(*) as enrollment_count
+    FROM mdl_user_enrolments
+    WHERE timecreated >= DATEADD(DAY, -?, GETDATE())
+    GROUP BY DATEADD(DAY, DATEDIFF(DAY, 0, timecreated), 0)
+    ORDER BY enrollment_date DESC
+    """
+
+# First-enrollment dates come from one MIN() OVER (PARTITION BY userid) pass
+# over the history of users active in the window, instead of a correlated
+# subquery per row. {since} is the start of the window.
+_TRENDS_CTE_TEMPLATE = """
+    WITH window_start AS (
+        SELECT {since} as since
+    ),
+    user_history AS (
+        SELECT
+            ue.userid,
+            ue.enrolid,
+            ue.timecreated,
+            MIN(ue.timecreated) OVER (PARTITION BY ue.userid) as first_timecreated
+        FROM mdl_user_enrolments ue
+        WHERE ue.userid IN (
+            SELECT recent.userid
+            FROM mdl_user_enrolments recent
+            CROSS JOIN window_start w
+            WHERE recent.timecreated >= w.since
+        )
+    )"""
+
+# Live trends cover a rolling window ending now
+_TRENDS_CTE = _TRENDS_CTE_TEMPLATE.format(since='DATEADD(DAY, -?, GETDATE())')
+
+# The rollup re-aggregates whole days: starting at midnight keeps the oldest
+# day in the window from being overwritten with a partial count
+_ROLLUP_CTE = _TRENDS_CTE_TEMPLATE.format(since='CAST(DATEADD(DAY, -?, GETDATE()) AS DATE)')
+
+_TRENDS_DAILY_SELECT = """
+    SELECT
+        CAST(h.timecreated AS DATE) as enrollment_date,
+        COUNT(*) as total_enrollments,
+        COUNT(DISTINCT h.userid) as unique_users,
+        COUNT(DISTINCT e.courseid) as unique_courses,
+        AVG(DATEDIFF(DAY, h.first_timecreated, h.timecreated)) as avg_days_since_first_enrollment
+    FROM user_history h
+    JOIN mdl_enrol e ON h.enrolid = e.id
+    CROSS JOIN window_start w
+    WHERE h.timecreated >= w.since
+    GROUP BY CAST(h.timecreated AS DATE)"""
+
+ENROLLMENT_TRENDS_SQL = _TRENDS_CTE + _TRENDS_DAILY_SELECT + """
+    ORDER BY enrollment_date DESC
+    """
+
+# Optional pre-aggregated trends: one row per day, maintained by
+# refresh_daily_rollup (run nightly) so reads skip the DISTINCT scans.
+ROLLUP_TRENDS_SQL = """
+    SELECT
+        rollup_date as enrollment_date,
+        total_enrollments,
+        unique_users,
+        unique_courses,
+        avg_days_since_first_enrollment
+    FROM mdl_enrol_daily_rollup
+    WHERE rollup_date >= CAST(DATEADD(DAY, -?, GETDATE()) AS DATE)
+    ORDER BY rollup_date DESC
+    """
+
+ROLLUP_TABLE_SQL = """
+    IF OBJECT_ID('mdl_enrol_daily_rollup', 'U') IS NULL
+    CREATE TABLE mdl_enrol_daily_rollup (
+        rollup_date DATE NOT NULL PRIMARY KEY,
+        total_enrollments INT NOT NULL,
+        unique_users INT NOT NULL,
+        unique_courses INT NOT NULL,
+        avg_days_since_first_enrollment INT NULL
+    )
+    """
+
+ROLLUP_REFRESH_SQL = _ROLLUP_CTE + """
+    MERGE mdl_enrol_daily_rollup AS target
+    USING (""" + _TRENDS_DAILY_SELECT + """
+    ) AS source
+    ON target.rollup_date = source.enrollment_date
+    WHEN MATCHED THEN UPDATE SET
+        total_enrollments = source.total_enrollments,
+        unique_users = source.unique_users,
+        unique_courses = source.unique_courses,
+        avg_days_since_first_enrollment = source.avg_days_since_first_enrollment
+    WHEN NOT MATCHED THEN INSERT
+        (rollup_date, total_enrollments, unique_users, unique_courses, avg_days_since_first_enrollment)
+        VALUES (source.enrollment_date, source.total_enrollments, source.unique_users,
+                source.unique_courses, source.avg_days_since_first_enrollment);
+    """
+
+COURSE_ENROLLMENTS_SQL = """
+    SELECT
+        c.fullname as course_name,
+        c.shortname as course_code,
+        cat.name as category_name,
+        COUNT(ue.id) as enrollment_count
+    FROM mdl_user_enrolments ue
+    JOIN mdl_enrol e ON ue.enrolid = e.id
+    JOIN mdl_course c ON e.courseid = c.id
+    LEFT JOIN mdl_course_categories cat ON c.category = cat.id
+    WHERE ue.timecreated >= ? AND ue.timecreated < ?
+    GROUP BY c.fullname, c.shortname, cat.name
+    ORDER BY enrollment_count DESC, c.fullname
+    """
+
 class EnrollmentAnalytics:
-    def __init__(self, server=None, database=None, username=None, password=None):
+    def __init__(self, server=None, database=None, username=None, password=None, use_rollup=False):
         self.server = server or os.getenv('MSSQL_SERVER', 'localhost')
         self.database = database or os.getenv('MSSQL_DATABASE', 'moodle')
         self.username = username or os.getenv('MSSQL_USERNAME', 'sa')
         self.password = password or os.getenv('MSSQL_PASSWORD', '')
+        # Read trends from mdl_enrol_daily_rollup instead of mdl_user_enrolments
+        self.use_rollup = use_rollup
+        # Successful query results by call, as (time stored, result)
+        self._query_cache = {}
 
         # Connection string for MSSQL
         self.conn_str = (
@@ -29,128 +181,132 @@ class EnrollmentAnalytics:
     def connect(self):
         """Establish database connection"""
         try:
-            self.conn = pyodbc.connect(self.conn_str)
+            # Read-only workload: autocommit skips the implicit transaction
+            self.conn = pyodbc.connect(self.conn_str, autocommit=True)
+            self.conn.timeout = 30
             self.cursor = self.conn.cursor()
+            self.cursor.arraysize = 500
             print(f"✅ Connected to MSSQL database: {self.database}")
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
             return False
 
+    def cached(self, method_name, *args, **kwargs):
+        """Return a still-fresh cached result of a query method, or None (no database access)"""
+        now = time.monotonic()
+        # Evict expired entries so the cache only ever holds live results
+        expired = [key for key, (stored, _) in self._query_cache.items() if now - stored >= QUERY_CACHE_TTL]
+        for key in expired:
+            del self._query_cache[key]
+        hit = self._query_cache.get(_query_key(method_name, args, kwargs))
+        return hit[1] if hit else None
+
+    @_cached_query("❌ Query failed", list)
     def get_daily_enrollments(self, days_back=30):
         """Get daily enrollment counts for the specified number of days"""
-        try:
-            query = """
-            SELECT
-                CAST(timecreated AS DATE) as enrollment_date,
-                COUNT(*) as enrollment_count
-            FROM mdl_user_enrolments
-            WHERE timecreated >= DATEADD(DAY, -?, GETDATE())
-            GROUP BY CAST(timecreated AS DATE)
-            ORDER BY enrollment_date DESC
-            """
-
-            self.cursor.execute(query, days_back)
-            results = self.cursor.fetchall()
-
-            # Convert to list of dictionaries
-            daily_counts = []
-            for row in results:
-                daily_counts.append({
-                    'date': row.enrollment_date,
-                    'count': row.enrollment_count
-                })
-
-            return daily_counts
-
-        except Exception as e:
-            print(f"❌ Query failed: {e}")
-            return []
+        self.cursor.execute(DAILY_ENROLLMENTS_SQL, days_back)
+        return self._daily_rows(self.cursor.fetchall())
 
+    @_cached_query("❌ Trends query failed", list)
     def get_enrollment_trends(self, days_back=30):
         """Get enrollment trends with additional metrics"""
-        try:
-            query = """
-            SELECT
-                CAST(ue.timecreated AS DATE) as enrollment_date,
-                COUNT(*) as total_enrollments,
-                COUNT(DISTINCT ue.userid) as unique_users,
-                COUNT(DISTINCT e.courseid) as unique_courses,
-                AVG(DATEDIFF(DAY,
-                    (SELECT MIN(timecreated) FROM mdl_user_enrolments WHERE userid = ue.userid),
-                    ue.timecreated
-                )) as avg_days_since_first_enrollment
-            FROM mdl_user_enrolments ue
-            JOIN mdl_enrol e ON ue.enrolid = e.id
-            WHERE ue.timecreated >= DATEADD(DAY, -?, GETDATE())
-            GROUP BY CAST(ue.timecreated AS DATE)
-            ORDER BY enrollment_date DESC
-            """
-
-            self.cursor.execute(query, days_back)
-            results = self.cursor.fetchall()
-
-            trends = []
-            for row in results:
-                trends.append({
-                    'date': row.enrollment_date,
-                    'total_enrollments': row.total_enrollments,
-                    'unique_users': row.unique_users,
-                    'unique_courses': row.unique_courses,
-                    'avg_days_since_first': float(row.avg_days_since_first_enrollment) if row.avg_days_since_first_enrollment else 0
-                })
-
-            return trends
-
-        except Exception as e:
-            print(f"❌ Trends query failed: {e}")
-            return []
+        self.cursor.execute(self._trends_sql(), days_back)
+        return self._trend_rows(self.cursor.fetchall())
 
+    @_cached_query("❌ Course enrollments query failed", list)
     def get_course_enrollments_by_date(self, target_date=None):
         """Get course-specific enrollment counts for a specific date"""
         if target_date is None:
             target_date = datetime.now().date()
 
+        # Half-open day range keeps the predicate index-friendly
+        self.cursor.execute(COURSE_ENROLLMENTS_SQL, target_date, target_date + timedelta(days=1))
+        return self._course_rows(self.cursor.fetchall())
+
+    @_cached_query("❌ Dashboard metrics batch failed",
+                   lambda: {'daily_enrollments': [], 'trends': [], 'today_courses': []})
+    def get_all_dashboard_metrics(self, days_daily=30, days_trends=7, target_date=None):
+        """Run the daily, trends and course queries as one batch (single round-trip)"""
+        if target_date is None:
+            target_date = datetime.now().date()
+
+        sql = ";\n".join([DAILY_ENROLLMENTS_SQL, self._trends_sql(), COURSE_ENROLLMENTS_SQL])
+        self.cursor.execute(sql, days_daily, days_trends, target_date, target_date + timedelta(days=1))
+
+        daily_counts = self._daily_rows(self.cursor.fetchall())
+        self.cursor.nextset()
+        trends = self._trend_rows(self.cursor.fetchall())
+        self.cursor.nextset()
+        course_enrollments = self._course_rows(self.cursor.fetchall())
+
+        return {
+            'daily_enrollments': daily_counts,
+            'trends': trends,
+            'today_courses': course_enrollments
+        }
+
+    def refresh_daily_rollup(self, days_back=2):
+        """Recompute mdl_enrol_daily_rollup rows for recent days (run nightly)"""
         try:
-            query = """
-            SELECT
-                c.fullname as course_name,
-                c.shortname as course_code,
-                cat.name as category_name,
-                COUNT(ue.id) as enrollment_count
-            FROM mdl_user_enrolments ue
-            JOIN mdl_enrol e ON ue.enrolid = e.id
-            JOIN mdl_course c ON e.courseid = c.id
-            LEFT JOIN mdl_course_categories cat ON c.category = cat.id
-            WHERE CAST(ue.timecreated AS DATE) = ?
-            GROUP BY c.fullname, c.shortname, cat.name
-            ORDER BY enrollment_count DESC, c.fullname
-            """
-
-            self.cursor.execute(query, target_date)
-            results = self.cursor.fetchall()
-
-            course_enrollments = []
-            for row in results:
-                course_enrollments.append({
-                    'course_name': row.course_name,
-                    'course_code': row.course_code,
-                    'category': row.category_name or 'Uncategorized',
-                    'enrollments': row.enrollment_count
-                })
-
-            return course_enrollments
+            self.cursor.execute(ROLLUP_TABLE_SQL)
+            self.cursor.execute(ROLLUP_REFRESH_SQL, days_back)
+            print(f"✅ Refreshed enrollment rollup for the last {days_back} days")
+            return True
 
         except Exception as e:
-            print(f"❌ Course enrollments query failed: {e}")
-            return []
+            print(f"❌ Rollup refresh failed: {e}")
+            return False
+
+    def _trends_sql(self):
+        """Trends query for the configured source (live table or daily rollup)"""
+        return ROLLUP_TRENDS_SQL if self.use_rollup else ENROLLMENT_TRENDS_SQL
+
+    # Row converters unpack by position: the SELECT column order is fixed, and
+    # tuple unpacking avoids a name lookup per pyodbc Row attribute access.
+    def _daily_rows(self, results):
+        """Convert daily enrollment rows to a list of dictionaries"""
+        return [
+            {
+                'date': enrollment_date,
+                'count': enrollment_count
+            }
+            for enrollment_date, enrollment_count in results
+        ]
+
+    def _trend_rows(self, results):
+        """Convert enrollment trend rows to a list of dictionaries"""
+        return [
+            {
+                'date': enrollment_date,
+                'total_enrollments': total_enrollments,
+                'unique_users': unique_users,
+                'unique_courses': unique_courses,
+                'avg_days_since_first': float(avg_days) if avg_days else 0
+            }
+            for enrollment_date, total_enrollments, unique_users, unique_courses, avg_days in results
+        ]
+
+    def _course_rows(self, results):
+        """Convert course enrollment rows to a list of dictionaries"""
+        return [
+            {
+                'course_name': course_name,
+                'course_code': course_code,
+                'category': category_name or 'Uncategorized',
+                'enrollments': enrollment_count
+            }
+            for course_name, course_code, category_name, enrollment_count in results
+        ]
 
     def close(self):
-        """Close database connection"""
+        """Close database connection (returns it to the ODBC pool)"""
         if hasattr(self, 'cursor') and self.cursor:
             self.cursor.close()
+            self.cursor = None
         if hasattr(self, 'conn') and self.conn:
             self.conn.close()
+            self.conn = None
 
 def main():
     # Initialize analytics
@@ -159,6 +315,15 @@ def main():
     if not analytics.connect():
         return
 
+    # Nightly job: python enrollment_analytics.py refresh-rollup [days]
+    if len(sys.argv) > 1 and sys.argv[1] == 'refresh-rollup':
+        days_back = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        try:
+            analytics.refresh_daily_rollup(days_back)
+        finally:
+            analytics.close()
+        return
+
     try:
         print("\n" + "="*60)
         print("📊 MOODLE DAILY ENROLLMENT ANALYTICS")
@@ -8,29 +8,293 @@ Handles logs from:
 - Original sync logs (enrolment_sync.log)
 """
 
+import io
 import os
 import re
 import glob
+import fnmatch
 from datetime import datetime, timedelta
 from pathlib import Path
 import json
+import hashlib
+import itertools
+import mmap
 import sys
+import time
+from contextlib import contextmanager
+from collections import Counter, deque
+from heapq import nlargest
+from html import escape
+from operator import itemgetter
 
 # Force UTF-8 output to fix Windows console crashes
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 
+
+def _trie_pattern(words):
+    """Build a regex alternation factored by shared prefixes"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = None  # End of a word
+
+    def emit(node):
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if '' in node:
+            return '(?:' + '|'.join(alts) + ')?' if alts else ''
+        return alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+
+    return emit(trie)
+
+
+def _case_variants(word):
+    """Every ASCII upper/lower-case spelling of word"""
+    return [''.join(chars) for chars in itertools.product(
+        *((ch.lower(), ch.upper()) if ch.isalpha() else (ch,) for ch in word))]
+
+
+# Sync log patterns, compiled once at import. The per-line ones are bytes
+# patterns so the mmapped log is scanned without decoding every line.
+_RE_PROCESSING = re.compile(r'Processing: (\d+) enrolments')
+_RE_PUSH_COMPLETE = re.compile(rb'Push complete: (\d+) successful, (\d+) failed')
+_RE_REMOVED = re.compile(rb'Successfully removed (\d+) enrolments')
+_RE_BATCH = re.compile(r'Batch (\d+) \((\d+) enrolments\) - (.+)')
+# Sync-log counters carried between incremental scans
+_SCAN_COUNTERS = ('successful', 'errors', 'course_not_found', 'user_creation_failed',
+                  'api_errors', 'faculty_breakdown', 'department_breakdown')
+# Leading bytes compared to tell a rotated log from a grown one
+_SCAN_HEAD_BYTES = 256
+# Faculty code hits buffered before they are tallied in one batch
+_FACULTY_HIT_BATCH = 65536
+
+# Any line the success/error classification below can act on. Keyword sets
+# are compiled as prefix tries (case-insensitive words spelled out), so the
+# engine branches on each byte once instead of retrying every alternative.
+_RE_SYNC_EVENT = re.compile(_trie_pattern([
+    'Push complete:', 'Successfully removed', 'Course', 'Failed to create user',
+    *_case_variants('error')]).encode())
+# Case-insensitive keyword tests without lowercasing a copy of each line
+_RE_ERROR_WORD = re.compile(rb'error', re.IGNORECASE)
+_RE_ACTIVITY = re.compile(r'batch|success|error|complete|processing', re.IGNORECASE)
+
+# Faculty/Department code mappings (based on course codes observed)
+FACULTY_CODES = {
+    'FNLT': 'Faculty of Applied Sciences',
+    'CAAU': 'Faculty of Accounting and Informatics',
+    'BSNC': 'Faculty of Applied Sciences',
+    'BNMN': 'Faculty of Management Sciences',
+    'SHPM': 'Faculty of Management Sciences',
+    'IMIC': 'Faculty of Applied Sciences',
+    'TRMP': 'Faculty of Engineering and the Built Environment',
+    'WWRK': 'Faculty of Engineering and the Built Environment',
+    'CMEP': 'Faculty of Engineering and the Built Environment',
+    'REMA': 'Faculty of Management Sciences',
+    'TAXB': 'Faculty of Accounting and Informatics',
+    'CCHB': 'Faculty of Applied Sciences',
+    'PBLF': 'Faculty of Management Sciences',
+    'TIPP': 'Faculty of Management Sciences',
+    'CADR': 'Faculty of Arts and Design',
+    'HYSA': 'Faculty of Applied Sciences',
+    'LABR': 'Faculty of Applied Sciences',
+    'IMAE': 'Faculty of Applied Sciences',
+    'FSTX': 'Faculty of Applied Sciences',
+    'FPSO': 'Faculty of Applied Sciences',
+    'FDPD': 'Faculty of Applied Sciences'
+}
+
+# Faculty codes are four capitals, so they can only sit inside a run of
+# capitals. One C-level scan finds the runs; every 4-letter window of a run
+# is then a set lookup, which keeps overlapping codes (e.g. "FNLTAXB")
+# matchable, like per-code substring tests.
+_RE_CAPITAL_RUN = re.compile(rb'[A-Z]{4,}')
+# Matched code bytes -> department code / faculty name
+_DEPARTMENT_BY_MATCH = {code.encode(): code for code in FACULTY_CODES}
+_FACULTY_BY_MATCH = {code.encode(): faculty for code, faculty in FACULTY_CODES.items()}
+# Course context: "_SEM" (case-sensitive) or "course" (any case)
+_RE_COURSE_CONTEXT = re.compile(_trie_pattern(['_SEM', *_case_variants('course')]).encode())
+
+# CSS class for each log type in the recent activity feed
+LOG_TYPE_CLASSES = {
+    'pipeline': 'log-pipeline',
+    'enroll': 'log-enroll',
+    'wrapper': 'log-wrapper',
+    'results': 'log-results',
+    'sync': 'log-sync',
+    'purge': 'log-purge',
+    'course_creation': 'log-course_creation'
+}
+
+# Pipeline log patterns, compiled once at import
+_RE_PIPELINE_COMPLETE = re.compile(r'complete', re.IGNORECASE)
+_RE_PIPELINE_ENROLLMENTS = re.compile(r'Enrollments: (\d+) successful, (\d+) failed')
+_RE_PIPELINE_EXTRACTION = re.compile(r'Extraction complete: (.+\.csv)')
+_RE_PIPELINE_OUTPUT = re.compile(r'Output file: (.+\.csv)')
+_RE_PIPELINE_TIME = re.compile(r'Time: ([\d.]+) seconds')
+
+# Bootstrap colour for each system status badge
+STATUS_COLORS = {
+    'healthy': 'success',
+    'warning': 'warning',
+    'critical': 'danger',
+    'inactive': 'secondary'
+}
+
+# Static parts of the dashboard page, built once at import
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Moodle Enrollment System Monitor</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
+    <style>
+        body { background-color: #f8f9fa; }
+        .metric-card { transition: transform 0.2s; }
+        .metric-card:hover { transform: translateY(-2px); box-shadow: 0 4px 8px rgba(0,0,0,0.15); }
+        .log-entry { 
+            font-family: 'Courier New', monospace; 
+            font-size: 0.85rem;
+            border-left: 3px solid transparent;
+            padding: 2px 8px;
+            margin: 2px 0;
+        }
+        .log-pipeline { border-left-color: #007bff; background-color: #f0f7ff; }
+        .log-enroll { border-left-color: #28a745; background-color: #f0fff0; }
+        .log-wrapper { border-left-color: #ffc107; background-color: #fff8e0; }
+        .log-purge { border-left-color: #dc3545; background-color: #fff0f0; }
+        .log-course_creation { border-left-color: #6f42c1; background-color: #f6f0ff; }
+    </style>
+</head>
+"""
+
+_ENROLLMENTS_TABLE_HEAD = """
+        <div class="row mb-4">
+            <div class="col-12">
+                <div class="card">
+                    <div class="card-header bg-success text-white">
+                        <h5 class="mb-0">✅ Recent Enrollment Operations (Last 24h)</h5>
+                    </div>
+                    <div class="card-body">
+                        <div class="table-responsive">
+                            <table class="table table-sm table-hover">
+                                <thead>
+                                    <tr>
+                                        <th>Time</th>
+                                        <th>File</th>
+                                        <th>Records</th>
+                                        <th>Success</th>
+                                        <th>Errors</th>
+                                        <th>Users Found</th>
+                                        <th>Users Missing</th>
+                                        <th>Courses Found</th>
+                                        <th>Users Created</th>
+                                        <th>Mode</th>
+                                    </tr>
+                                </thead>
+                                <tbody>"""
+
+_PIPELINES_TABLE_HEAD = """
+        <div class="row mb-4">
+            <div class="col-12">
+                <div class="card">
+                    <div class="card-header bg-primary text-white">
+                        <h5 class="mb-0">🔄 Recent Pipeline Runs</h5>
+                    </div>
+                    <div class="card-body">
+                        <div class="table-responsive">
+                            <table class="table table-sm">
+                                <thead>
+                                    <tr>
+                                        <th>Time</th>
+                                        <th>Source Type</th>
+                                        <th>Steps</th>
+                                        <th>Records</th>
+                                        <th>Success</th>
+                                        <th>Errors</th>
+                                        <th>Extraction File</th>
+                                        <th>Processing Time</th>
+                                    </tr>
+                                </thead>
+                                <tbody>"""
+
+_TABLE_TAIL = """
+                                </tbody>
+                            </table>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        </div>"""
+
+_HTML_TAIL = """
+    </div>
+    
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
+</body>
+</html>"""
+
+# Repeated rows and cards, filled in per render with str.format
+_ENROLLMENT_ROW_TEMPLATE = """
+                                    <tr>
+                                        <td>{time}</td>
+                                        <td><small>{file}</small></td>
+                                        <td class="text-center">{m[total_records]:,}</td>
+                                        <td class="text-success text-center">{m[successful]:,}</td>
+                                        <td class="text-danger text-center">{m[errors]:,}</td>
+                                        <td class="text-center">{m[users_found]:,}</td>
+                                        <td class="text-center text-warning">{m[users_missing]:,}</td>
+                                        <td class="text-center">{m[courses_found]:,}</td>
+                                        <td class="text-center">{m[users_created]:,}</td>
+                                        <td><span class="badge bg-{mode_class}">{mode}</span></td>
+                                    </tr>"""
+
+_PIPELINE_ROW_TEMPLATE = """
+                                    <tr>
+                                        <td>{time}</td>
+                                        <td>{source_type}</td>
+                                        <td>{steps_badge}</td>
+                                        <td>{m[total_records]:,}</td>
+                                        <td class="text-success">{m[successful]:,}</td>
+                                        <td class="text-danger">{m[errors]:,}</td>
+                                        <td><small>{extraction_file}</small></td>
+                                        <td>{m[processing_time]:.1f}s</td>
+                                    </tr>"""
+
+_LOG_SUMMARY_CARD_TEMPLATE = """
+                <div class="col-md-3 mb-3">
+                    <div class="card">
+                        <div class="card-body text-center">
+                            <h6 class="text-muted">{log_type}</h6>
+                            <h3>{info[count]}</h3>
+                            <small>Files</small>
+                            <p class="mt-2 mb-0"><small class="text-muted">Latest: {latest}</small></p>
+                            <p><small class="text-muted">Total: {info[size_kb]:.0f} KB</small></p>
+                        </div>
+                    </div>
+                </div>"""
+
+# "Generated" timestamps in the header and footer, refreshed on cache hits
+_RE_GENERATED_AT = re.compile(r'(Generated: |directories \|\s+)\d{4}-\d\d-\d\d \d\d:\d\d:\d\d')
+
 class EnrollmentMonitor:
-    def __init__(self, log_dirs=None, output_dir='.'):
+    def __init__(self, log_dirs=None, output_dir='.', log_file=r'C:\moodle_sync\enrolment_sync.log'):
         """
         Initialize monitor with multiple log directories
         
         Args:
             log_dirs: List of directories to scan for logs
             output_dir: Output directory for dashboard
+            log_file: Original sync log parsed by parse_log_file
         """
+        self.log_file = Path(log_file)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self._cache_path = self.output_dir / '.cache.json'
+        self._scan_state_path = self.output_dir / 'scan_state.json'
+        self._parse_cache_path = self.output_dir / '.parse_cache.json'
         
         # Default log directories to scan
         if log_dirs is None:
@@ -56,8 +320,31 @@ class EnrollmentMonitor:
             'course_creation': 'course_creation_*.log'
         }
         
+        # One regex classifies every file name; the matching group names the type
+        self._log_name_re = re.compile('|'.join(
+            f'(?P<{log_type}>{fnmatch.translate(os.path.normcase(pattern))})'
+            for log_type, pattern in self.log_patterns.items()))
+        
+        # Wall time per stage in nanoseconds, summed over repeated calls
+        self.timings = {}
+        
         # Find all logs
-        self.logs = self.find_all_logs()
+        with self._stage('find_logs'):
+            self.logs = self.find_all_logs()
+        
+    @contextmanager
+    def _stage(self, name):
+        """Add the wall time of the enclosed block to self.timings[name]"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter_ns() - start
+    
+    def timings_comment(self):
+        """Render the stage timings as an HTML comment, cheap to diff between runs"""
+        stages = ' '.join(f'{name}={ns / 1e6:.1f}ms' for name, ns in self.timings.items())
+        return f"\n<!-- timings: {stages} -->"
         
     def find_all_logs(self):
         """Find all log files in configured directories"""
@@ -67,19 +354,32 @@ class EnrollmentMonitor:
         
         for log_dir in self.log_dirs:
             dir_path = Path(log_dir)
-            if not dir_path.exists():
+            # One directory read per location; DirEntry.stat() reuses what it returned
+            try:
+                entries = list(os.scandir(dir_path))
+            except OSError:
                 continue
                 
-            for log_type, pattern in self.log_patterns.items():
-                for log_file in dir_path.glob(pattern):
-                    mtime = datetime.fromtimestamp(log_file.stat().st_mtime)
-                    all_logs[str(log_file)] = {
-                        'path': log_file,
-                        'type': log_type,
-                        'mtime': mtime,
-                        'size': log_file.stat().st_size / 1024  # KB
-                    }
-                    print(f"  📄 {log_type}: {log_file.name} ({mtime.strftime('%Y-%m-%d %H:%M:%S')})")
+            for entry in entries:
+                match = self._log_name_re.match(os.path.normcase(entry.name))
+                if not match:
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                log_type = match.lastgroup
+                log_file = dir_path / entry.name
+                mtime = datetime.fromtimestamp(stat.st_mtime)
+                all_logs[str(log_file)] = {
+                    'path': log_file,
+                    'type': log_type,
+                    'mtime': mtime,
+                    'size': stat.st_size / 1024,  # KB
+                    # Exact stamp for the per-file parse cache
+                    'stamp': [stat.st_mtime_ns, stat.st_size]
+                }
+                print(f"  📄 {log_type}: {log_file.name} ({mtime.strftime('%Y-%m-%d %H:%M:%S')})")
         
         # Sort by modification time (newest first)
         sorted_logs = dict(sorted(all_logs.items(), 
@@ -91,10 +391,8 @@ class EnrollmentMonitor:
     
     def get_latest_by_type(self, log_type):
         """Get the latest log of a specific type"""
-        type_logs = {k: v for k, v in self.logs.items() if v['type'] == log_type}
-        if type_logs:
-            return list(type_logs.values())[0]['path']
-        return None
+        # Logs are newest first, so the first match is the latest
+        return next((info['path'] for info in self.logs.values() if info['type'] == log_type), None)
     
     def parse_pipeline_log(self, log_file):
         """Parse flexible_pipeline.py log format"""
@@ -110,52 +408,263 @@ class EnrollmentMonitor:
         }
         
         try:
+            # Stream the log; no line outlives its own iteration
             with open(log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            for line in lines:
-                # Extract source type
-                if 'Source type:' in line:
-                    metrics['source_type'] = line.split('Source type:')[-1].strip()
+                for line in f:
+                    # Extract source type
+                    if 'Source type:' in line:
+                        metrics['source_type'] = line.split('Source type:')[-1].strip()
                 
-                # Extract step completion
-                if 'STEP 1:' in line and 'complete' in line.lower():
-                    metrics['steps_completed'].append('extraction')
-                elif 'STEP 2:' in line and 'complete' in line.lower():
-                    metrics['steps_completed'].append('processing')
-                elif 'STEP 3:' in line and 'complete' in line.lower():
-                    metrics['steps_completed'].append('enrollment')
+                    # Extract step completion (case-insensitive, without lowercasing the line)
+                    if 'STEP ' in line and _RE_PIPELINE_COMPLETE.search(line):
+                        if 'STEP 1:' in line:
+                            metrics['steps_completed'].append('extraction')
+                        elif 'STEP 2:' in line:
+                            metrics['steps_completed'].append('processing')
+                        elif 'STEP 3:' in line:
+                            metrics['steps_completed'].append('enrollment')
                 
-                # Extract enrollment stats
-                if 'Enrollments:' in line:
-                    match = re.search(r'Enrollments: (\d+) successful, (\d+) failed', line)
-                    if match:
-                        metrics['successful'] = int(match.group(1))
-                        metrics['errors'] = int(match.group(2))
-                        metrics['total_records'] = metrics['successful'] + metrics['errors']
+                    # Extract enrollment stats
+                    if 'Enrollments:' in line:
+                        match = _RE_PIPELINE_ENROLLMENTS.search(line)
+                        if match:
+                            metrics['successful'] = int(match.group(1))
+                            metrics['errors'] = int(match.group(2))
+                            metrics['total_records'] = metrics['successful'] + metrics['errors']
                 
-                # Extract file paths
-                if 'Extraction complete:' in line:
-                    match = re.search(r'Extraction complete: (.+\.csv)', line)
-                    if match:
-                        metrics['extraction_file'] = Path(match.group(1)).name
+                    # Extract file paths
+                    if 'Extraction complete:' in line:
+                        match = _RE_PIPELINE_EXTRACTION.search(line)
+                        if match:
+                            metrics['extraction_file'] = Path(match.group(1)).name
                 
-                if 'enrollment_ready' in line:
-                    match = re.search(r'Output file: (.+\.csv)', line)
-                    if match:
-                        metrics['enrollment_file'] = Path(match.group(1)).name
+                    if 'enrollment_ready' in line:
+                        match = _RE_PIPELINE_OUTPUT.search(line)
+                        if match:
+                            metrics['enrollment_file'] = Path(match.group(1)).name
                 
-                # Extract processing time
-                if 'Time:' in line and 'seconds' in line:
-                    match = re.search(r'Time: ([\d.]+) seconds', line)
-                    if match:
-                        metrics['processing_time'] = float(match.group(1))
+                    # Extract processing time
+                    if 'Time:' in line and 'seconds' in line:
+                        match = _RE_PIPELINE_TIME.search(line)
+                        if match:
+                            metrics['processing_time'] = float(match.group(1))
                         
         except Exception as e:
             print(f"Error parsing pipeline log: {e}")
         
         return metrics
     
+    def parse_log_file(self, log_file):
+        """Parse the original sync log (enrolment_sync.log) to extract key metrics"""
+        metrics = {
+            'last_run': None,
+            'total_records': 0,
+            'successful': 0,
+            'errors': 0,
+            'recent_entries': [],
+            'course_not_found': 0,
+            'user_creation_failed': 0,
+            'faculty_breakdown': Counter(),
+            'department_breakdown': Counter(),
+            'api_errors': 0,
+            'batch_info': []
+        }
+
+        try:
+            # Use file modification time as last run
+            stat = Path(log_file).stat()
+            mtime = datetime.fromtimestamp(stat.st_mtime)
+            metrics['last_run'] = mtime.strftime('%Y-%m-%d %H:%M:%S')
+
+            # Stream the log once; only bounded windows of lines are kept
+            processing_lines = deque(maxlen=10)  # Latest "Processing:" lines
+            batch_lines = deque(maxlen=10)       # Latest successful batches
+            code_hits = []                       # Faculty codes not yet tallied
+
+            with self._stage('sync_scan'), open(log_file, 'rb') as f:
+                # mmap refuses empty files; an empty log simply has no lines
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else None
+                # One forward pass: ask for aggressive readahead (POSIX only)
+                if mm and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                head = mm[:_SCAN_HEAD_BYTES] if mm else b''
+
+                # A log that only grew resumes where the previous run stopped;
+                # an empty log has no mapping to seek and nothing to resume
+                state = self.load_scan_state(log_file, stat, head) if mm else None
+                if state:
+                    for key in _SCAN_COUNTERS:
+                        if key.endswith('_breakdown'):
+                            metrics[key].update(state['metrics'][key])
+                        else:
+                            metrics[key] = state['metrics'][key]
+                    processing_lines.extend(line.encode('latin-1') for line in state['processing_lines'])
+                    batch_lines.extend(line.encode('latin-1') for line in state['batch_lines'])
+                    mm.seek(state['offset'])
+                state = None
+
+                for line in iter(mm.readline, b'') if mm else ():
+                    if not line.endswith(b'\n'):
+                        # Still being written: count it now, rescan it next run
+                        self._tally_faculty_hits(metrics, code_hits)
+                        state = self._snapshot_scan_state(
+                            log_file, stat, mm.tell() - len(line), head, metrics,
+                            processing_lines, batch_lines)
+                    if b'Processing:' in line:
+                        processing_lines.append(line)
+                    if b'Batch' in line and b'Success' in line:
+                        batch_lines.append(line)
+
+                    # Count successes, errors, and extract faculty information
+                    if not _RE_SYNC_EVENT.search(line):
+                        pass  # Plain enrolment records skip the keyword chain
+                    elif b'Push complete:' in line:
+                        # Extract final success/error counts
+                        match = _RE_PUSH_COMPLETE.search(line)
+                        if match:
+                            metrics['successful'] = int(match.group(1))
+                            metrics['errors'] = int(match.group(2))
+                    elif b'Successfully removed' in line:
+                        # Count unenrollments as successful operations
+                        match = _RE_REMOVED.search(line)
+                        if match:
+                            metrics['successful'] += int(match.group(1))
+                    elif b'Moodle API Error' in line:
+                        metrics['api_errors'] += 1
+                        metrics['errors'] += 1
+                    elif _RE_ERROR_WORD.search(line):
+                        if b'Moodle API Error' not in line:  # Avoid double counting
+                            metrics['errors'] += 1
+                    elif b'Course' in line and b'not found' in line:
+                        metrics['course_not_found'] += 1
+                    elif b'Failed to create user' in line:
+                        metrics['user_creation_failed'] += 1
+
+                    # Extract faculty information from course codes
+                    if not _RE_COURSE_CONTEXT.search(line):
+                        continue
+                    # Each code counts once per line; tallies are batched
+                    line_hits = {}
+                    for run in _RE_CAPITAL_RUN.findall(line):
+                        for i in range(len(run) - 3):
+                            code = run[i:i + 4]
+                            if code in _FACULTY_BY_MATCH:
+                                line_hits[code] = None
+                    code_hits.extend(line_hits)
+                    if len(code_hits) >= _FACULTY_HIT_BATCH:
+                        self._tally_faculty_hits(metrics, code_hits)
+                self._tally_faculty_hits(metrics, code_hits)
+                if state is None:
+                    state = self._snapshot_scan_state(
+                        log_file, stat, mm.tell() if mm else 0, head, metrics,
+                        processing_lines, batch_lines)
+                # End of the log for recent activity, found by walking back from EOF
+                tail_lines = self._mmap_tail_lines(mm, 50) if mm else []
+                if mm:
+                    mm.close()
+                    # Scanned bytes are never read again, so let them leave the page cache
+                    if hasattr(os, 'posix_fadvise'):
+                        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            self._write_json(self._scan_state_path, state)
+
+            # Only the kept windows are decoded, matching text-mode newlines
+            processing_lines = [self._decode_log_line(line) for line in processing_lines]
+            batch_lines = [self._decode_log_line(line) for line in batch_lines]
+            tail_lines = [self._decode_log_line(line) for line in tail_lines]
+
+            # Extract total records from the most recent "Processing:" line
+            if processing_lines:
+                match = _RE_PROCESSING.search(processing_lines[-1])
+                if match:
+                    metrics['total_records'] = int(match.group(1))
+
+            # Get recent entries (last 10 processing lines and recent activity)
+            recent_processing = list(processing_lines)
+            recent_activity = []
+
+            # Get last 10 lines that show activity
+            for line in reversed(tail_lines):  # Check last 50 lines
+                if _RE_ACTIVITY.search(line):
+                    recent_activity.append(line.strip())
+                    if len(recent_activity) >= 10:
+                        break
+
+            metrics['recent_entries'] = recent_processing + recent_activity[-5:]  # Combine processing and activity
+
+            # Extract batch information
+            for line in batch_lines:  # Last 10 batches
+                match = _RE_BATCH.search(line)
+                if match:
+                    metrics['batch_info'].append({
+                        'batch': int(match.group(1)),
+                        'count': int(match.group(2)),
+                        'status': match.group(3)
+                    })
+
+        except Exception as e:
+            print(f"Error parsing log file: {e}")
+
+        # Plain dicts for callers (and JSON caches)
+        metrics['faculty_breakdown'] = dict(metrics['faculty_breakdown'])
+        metrics['department_breakdown'] = dict(metrics['department_breakdown'])
+        return metrics
+
+    def _tally_faculty_hits(self, metrics, code_hits):
+        """Add buffered faculty code hits to both breakdowns and clear the buffer"""
+        with self._stage('faculty_tally'):
+            metrics['faculty_breakdown'].update(map(_FACULTY_BY_MATCH.__getitem__, code_hits))
+            metrics['department_breakdown'].update(map(_DEPARTMENT_BY_MATCH.__getitem__, code_hits))
+            code_hits.clear()
+
+    @staticmethod
+    def _decode_log_line(line):
+        """Decode a raw log line the way text-mode reading would"""
+        return line.decode('utf-8', errors='replace').replace('\r\n', '\n')
+
+    def load_scan_state(self, log_file, stat, head):
+        """Load the previous scan of log_file, or None if it must be rescanned"""
+        try:
+            with open(self._scan_state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A different path or file, a shrunk file or a new first line means rotation
+        if (state.get('path') != str(log_file) or state.get('inode') != stat.st_ino
+                or stat.st_size < state.get('offset', 0)
+                or state.get('head', '').encode('latin-1') != head[:len(state.get('head', ''))]):
+            return None
+        return state
+
+    @staticmethod
+    def _snapshot_scan_state(log_file, stat, offset, head, metrics, processing_lines, batch_lines):
+        """Capture everything needed to resume a scan at offset"""
+        # Raw lines round-trip through JSON losslessly as latin-1 text
+        return {
+            'path': str(log_file),
+            'inode': stat.st_ino,
+            'offset': offset,
+            'head': head[:offset].decode('latin-1'),
+            'metrics': {key: (dict(metrics[key]) if key.endswith('_breakdown') else metrics[key])
+                        for key in _SCAN_COUNTERS},
+            'processing_lines': [line.decode('latin-1') for line in processing_lines],
+            'batch_lines': [line.decode('latin-1') for line in batch_lines]
+        }
+
+    @staticmethod
+    def _mmap_tail_lines(mm, count):
+        """Return the last count lines of a mapped file, as readline would split them"""
+        start = len(mm)
+        for _ in range(count):
+            if start == 0:
+                break
+            # The byte before start ends the previous line, so search before it
+            start = mm.rfind(b'\n', 0, start - 1) + 1
+        parts = mm[start:].split(b'\n')
+        lines = [part + b'\n' for part in parts[:-1]]
+        if parts[-1]:
+            lines.append(parts[-1])  # Final line without a newline
+        return lines
+
     def parse_enrollment_results(self, json_file):
         """Parse enrollment_results_*.json files"""
         try:
@@ -180,7 +689,7 @@ class EnrollmentMonitor:
             print(f"Error parsing results JSON: {e}")
             return None
     
-    def generate_combined_metrics(self):
+    def generate_combined_metrics(self, now=None):
         """Generate combined metrics from all log types"""
         combined = {
             'last_run': None,
@@ -193,7 +702,8 @@ class EnrollmentMonitor:
             'log_summary': {}
         }
         
-        cutoff_24h = datetime.now() - timedelta(hours=24)
+        cutoff_24h = (now or datetime.now()) - timedelta(hours=24)
+        recent_logs = []  # Results and pipeline logs from the last 24h, in scan order
         
         for log_path_str, log_info in self.logs.items():
             log_path = log_info['path']
@@ -204,42 +714,50 @@ class EnrollmentMonitor:
             if combined['last_run'] is None or log_time > combined['last_run']:
                 combined['last_run'] = log_time
             
-            # Summarize by type
-            if log_type not in combined['log_summary']:
-                combined['log_summary'][log_type] = {
+            # Summarize by type, looking the entry up once per log
+            summary = combined['log_summary'].get(log_type)
+            if summary is None:
+                summary = combined['log_summary'][log_type] = {
                     'count': 0,
                     'latest': None,
                     'size_kb': 0
                 }
             
-            combined['log_summary'][log_type]['count'] += 1
-            combined['log_summary'][log_type]['size_kb'] += log_info['size']
+            summary['count'] += 1
+            summary['size_kb'] += log_info['size']
             
-            if combined['log_summary'][log_type]['latest'] is None or log_time > combined['log_summary'][log_type]['latest']:
-                combined['log_summary'][log_type]['latest'] = log_time
+            if summary['latest'] is None or log_time > summary['latest']:
+                summary['latest'] = log_time
             
-            # Parse based on type
-            metrics = None
-            if log_type == 'results' and log_time > cutoff_24h:
-                metrics = self.parse_enrollment_results(log_path)
-                if metrics:
-                    combined['recent_enrollments'].append({
-                        'time': log_time,
-                        'file': log_path.name,
-                        'metrics': metrics
-                    })
-                    combined['total_records_24h'] += metrics['total_records']
-                    combined['successful_24h'] += metrics['successful']
-                    combined['errors_24h'] += metrics['errors']
+            if log_type in ('results', 'pipeline') and log_time > cutoff_24h:
+                recent_logs.append(log_info)
+        
+        # Unchanged files reuse last run's parse; only files seen now are kept
+        parse_cache = self.load_parse_cache()
+        next_parse_cache = {}
+        with self._stage('parse_logs'):
+            parsed = self._parse_logs(recent_logs, parse_cache, next_parse_cache)
+        
+        for log_info, metrics in zip(recent_logs, parsed):
+            if not metrics:
+                continue
+            entry = {
+                'time': log_info['mtime'],
+                'file': log_info['path'].name,
+                'metrics': metrics
+            }
             
-            elif log_type == 'pipeline' and log_time > cutoff_24h:
-                metrics = self.parse_pipeline_log(log_path)
-                if metrics:
-                    combined['pipelines'].append({
-                        'time': log_time,
-                        'file': log_path.name,
-                        'metrics': metrics
-                    })
+            # Combine based on type
+            if log_info['type'] == 'results':
+                combined['recent_enrollments'].append(entry)
+                combined['total_records_24h'] += metrics['total_records']
+                combined['successful_24h'] += metrics['successful']
+                combined['errors_24h'] += metrics['errors']
+            else:
+                combined['pipelines'].append(entry)
+        
+        if next_parse_cache != parse_cache:
+            self._write_json(self._parse_cache_path, next_parse_cache)
         
         # Determine system status
         if combined['errors_24h'] > 100:
@@ -251,42 +769,35 @@ class EnrollmentMonitor:
         
         return combined
     
-    def generate_html(self, combined_metrics):
+    def load_parse_cache(self):
+        """Load per-file parse results from the previous run"""
+        try:
+            with open(self._parse_cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _parse_logs(self, log_infos, parse_cache, next_parse_cache):
+        """Parse results/pipeline logs in order, reusing cached results while mtime and size match"""
+        parsers = {'results': self.parse_enrollment_results, 'pipeline': self.parse_pipeline_log}
+        results = []
+        for log_info in log_infos:
+            key = str(log_info['path'])
+            entry = parse_cache.get(key)
+            if entry and entry['stamp'] == log_info['stamp']:
+                metrics = entry['metrics']
+            else:
+                metrics = parsers[log_info['type']](log_info['path'])
+            if metrics:
+                next_parse_cache[key] = {'stamp': log_info['stamp'], 'metrics': metrics}
+            results.append(metrics)
+        return results
+
+    def generate_html(self, combined_metrics, now=None):
         """Generate enhanced HTML dashboard"""
+        generated = (now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
         
-        status_colors = {
-            'healthy': 'success',
-            'warning': 'warning',
-            'critical': 'danger',
-            'inactive': 'secondary'
-        }
-        
-        html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Moodle Enrollment System Monitor</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
-    <style>
-        body {{ background-color: #f8f9fa; }}
-        .metric-card {{ transition: transform 0.2s; }}
-        .metric-card:hover {{ transform: translateY(-2px); box-shadow: 0 4px 8px rgba(0,0,0,0.15); }}
-        .log-entry {{ 
-            font-family: 'Courier New', monospace; 
-            font-size: 0.85rem;
-            border-left: 3px solid transparent;
-            padding: 2px 8px;
-            margin: 2px 0;
-        }}
-        .log-pipeline {{ border-left-color: #007bff; background-color: #f0f7ff; }}
-        .log-enroll {{ border-left-color: #28a745; background-color: #f0fff0; }}
-        .log-wrapper {{ border-left-color: #ffc107; background-color: #fff8e0; }}
-        .log-purge {{ border-left-color: #dc3545; background-color: #fff0f0; }}
-        .log-course_creation {{ border-left-color: #6f42c1; background-color: #f6f0ff; }}
-    </style>
-</head>
-<body>
+        sections = [_HTML_HEAD, f"""<body>
     <div class="container mt-4">
         <!-- Header -->
         <div class="row mb-4">
@@ -295,13 +806,13 @@ class EnrollmentMonitor:
                     <div class="card-body">
                         <h1 class="text-center">
                             🎓 Moodle Enrollment System Monitor
-                            <span class="badge bg-{status_colors.get(combined_metrics['system_status'], 'secondary')} ms-2">
+                            <span class="badge bg-{STATUS_COLORS.get(combined_metrics['system_status'], 'secondary')} ms-2">
                                 {combined_metrics['system_status'].upper()}
                             </span>
                         </h1>
                         <p class="text-center text-muted">
                             Last activity: {combined_metrics['last_run'].strftime('%Y-%m-%d %H:%M:%S') if combined_metrics['last_run'] else 'Never'} |
-                            Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+                            Generated: {generated}
                         </p>
                     </div>
                 </div>
@@ -353,113 +864,37 @@ class EnrollmentMonitor:
                     </div>
                 </div>
             </div>
-        </div>"""
+        </div>"""]
         
         # Recent Enrollments from JSON Results
         if combined_metrics['recent_enrollments']:
-            html += f"""
-        <div class="row mb-4">
-            <div class="col-12">
-                <div class="card">
-                    <div class="card-header bg-success text-white">
-                        <h5 class="mb-0">✅ Recent Enrollment Operations (Last 24h)</h5>
-                    </div>
-                    <div class="card-body">
-                        <div class="table-responsive">
-                            <table class="table table-sm table-hover">
-                                <thead>
-                                    <tr>
-                                        <th>Time</th>
-                                        <th>File</th>
-                                        <th>Records</th>
-                                        <th>Success</th>
-                                        <th>Errors</th>
-                                        <th>Users Found</th>
-                                        <th>Users Missing</th>
-                                        <th>Courses Found</th>
-                                        <th>Users Created</th>
-                                        <th>Mode</th>
-                                    </tr>
-                                </thead>
-                                <tbody>"""
+            sections.append(_ENROLLMENTS_TABLE_HEAD)
             
             for enroll in combined_metrics['recent_enrollments'][:10]:
                 m = enroll['metrics']
-                html += f"""
-                                    <tr>
-                                        <td>{enroll['time'].strftime('%H:%M:%S')}</td>
-                                        <td><small>{enroll['file'][:30]}</small></td>
-                                        <td class="text-center">{m['total_records']:,}</td>
-                                        <td class="text-success text-center">{m['successful']:,}</td>
-                                        <td class="text-danger text-center">{m['errors']:,}</td>
-                                        <td class="text-center">{m['users_found']:,}</td>
-                                        <td class="text-center text-warning">{m['users_missing']:,}</td>
-                                        <td class="text-center">{m['courses_found']:,}</td>
-                                        <td class="text-center">{m['users_created']:,}</td>
-                                        <td><span class="badge bg-{'warning' if m['dry_run'] else 'success'}">{'DRY RUN' if m['dry_run'] else 'LIVE'}</span></td>
-                                    </tr>"""
+                sections.append(_ENROLLMENT_ROW_TEMPLATE.format(
+                    time=enroll['time'].strftime('%H:%M:%S'), file=escape(enroll['file'][:30]), m=m,
+                    mode_class='warning' if m['dry_run'] else 'success',
+                    mode='DRY RUN' if m['dry_run'] else 'LIVE'))
             
-            html += """
-                                </tbody>
-                            </table>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>"""
+            sections.append(_TABLE_TAIL)
         
         # Recent Pipeline Runs
         if combined_metrics['pipelines']:
-            html += f"""
-        <div class="row mb-4">
-            <div class="col-12">
-                <div class="card">
-                    <div class="card-header bg-primary text-white">
-                        <h5 class="mb-0">🔄 Recent Pipeline Runs</h5>
-                    </div>
-                    <div class="card-body">
-                        <div class="table-responsive">
-                            <table class="table table-sm">
-                                <thead>
-                                    <tr>
-                                        <th>Time</th>
-                                        <th>Source Type</th>
-                                        <th>Steps</th>
-                                        <th>Records</th>
-                                        <th>Success</th>
-                                        <th>Errors</th>
-                                        <th>Extraction File</th>
-                                        <th>Processing Time</th>
-                                    </tr>
-                                </thead>
-                                <tbody>"""
+            sections.append(_PIPELINES_TABLE_HEAD)
             
             for pipeline in combined_metrics['pipelines']:
                 m = pipeline['metrics']
                 steps_badge = ''.join([f'<span class="badge bg-success me-1">✓{s[:3]}</span>' for s in m['steps_completed']])
-                html += f"""
-                                    <tr>
-                                        <td>{pipeline['time'].strftime('%H:%M:%S')}</td>
-                                        <td>{m['source_type']}</td>
-                                        <td>{steps_badge}</td>
-                                        <td>{m['total_records']:,}</td>
-                                        <td class="text-success">{m['successful']:,}</td>
-                                        <td class="text-danger">{m['errors']:,}</td>
-                                        <td><small>{m['extraction_file'] or 'N/A'}</small></td>
-                                        <td>{m['processing_time']:.1f}s</td>
-                                    </tr>"""
+                sections.append(_PIPELINE_ROW_TEMPLATE.format(
+                    time=pipeline['time'].strftime('%H:%M:%S'), steps_badge=steps_badge, m=m,
+                    source_type=escape(m['source_type']),
+                    extraction_file=escape(m['extraction_file'] or 'N/A')))
             
-            html += """
-                                </tbody>
-                            </table>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>"""
+            sections.append(_TABLE_TAIL)
         
         # Recent Log Entries from All Logs
-        html += f"""
+        sections.append(f"""
         <div class="row mb-4">
             <div class="col-12">
                 <div class="card">
@@ -480,37 +915,23 @@ class EnrollmentMonitor:
                     <div class="card-body text-center text-muted small">
                         Generated by Enhanced Enrollment Monitor | 
                         Scanning {len(self.logs)} log files in {len(self.log_dirs)} directories |
-                        {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+                        {generated}
                     </div>
                 </div>
             </div>
-        </div>
-    </div>
-    
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
-</body>
-</html>"""
+        </div>""")
+        sections.append(_HTML_TAIL)
         
-        return html
+        return ''.join(sections)
     
     def generate_log_summary_html(self, log_summary):
         """Generate HTML for log summary"""
-        html = ''
+        parts = []
         for log_type, info in log_summary.items():
             latest = info['latest'].strftime('%H:%M:%S') if info['latest'] else 'Never'
-            html += f"""
-                <div class="col-md-3 mb-3">
-                    <div class="card">
-                        <div class="card-body text-center">
-                            <h6 class="text-muted">{log_type.upper()}</h6>
-                            <h3>{info['count']}</h3>
-                            <small>Files</small>
-                            <p class="mt-2 mb-0"><small class="text-muted">Latest: {latest}</small></p>
-                            <p><small class="text-muted">Total: {info['size_kb']:.0f} KB</small></p>
-                        </div>
-                    </div>
-                </div>"""
-        return html
+            parts.append(_LOG_SUMMARY_CARD_TEMPLATE.format(
+                log_type=log_type.upper(), info=info, latest=latest))
+        return ''.join(parts)
     
     def get_recent_log_entries(self, max_entries=50):
         """Get recent entries from all log files"""
@@ -518,60 +939,73 @@ class EnrollmentMonitor:
         
         for log_path_str, log_info in list(self.logs.items())[:10]:  # Check latest 10 logs
             log_path = log_info['path']
-            log_type = log_info['type']
+            # Resolve the colour class once per log, not per entry
+            type_class = LOG_TYPE_CLASSES.get(log_info['type'], '')
             
             try:
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    # Get last 10 lines from each log
-                    for line in lines[-10:]:
-                        if line.strip():
-                            all_entries.append({
-                                'time': log_info['mtime'],
-                                'type': log_type,
-                                'line': line.strip(),
-                                'file': log_path.name
-                            })
+                # Get last 10 lines from each log
+                for line in self._read_tail_lines(log_path, 10):
+                    if line.strip():
+                        all_entries.append({
+                            'time': log_info['mtime'],
+                            'type_class': type_class,
+                            'line': line.strip(),
+                            'file': log_path.name
+                        })
             except Exception:
                 continue
         
-        # Sort by time (newest first) and limit
-        all_entries.sort(key=lambda x: x['time'], reverse=True)
+        # Newest first, limited; a partial heap sort instead of sorting everything
+        newest_entries = nlargest(max_entries, all_entries, key=itemgetter('time'))
         
-        html = '<div class="list-group list-group-flush">'
-        for entry in all_entries[:max_entries]:
+        parts = ['<div class="list-group list-group-flush">']
+        for entry in newest_entries:
             # Truncate long lines
             line = entry['line']
             if len(line) > 150:
                 line = line[:147] + '...'
             
-            # Color code by type
-            type_class = {
-                'pipeline': 'log-pipeline',
-                'enroll': 'log-enroll',
-                'wrapper': 'log-wrapper',
-                'results': 'log-results',
-                'sync': 'log-sync',
-                'purge': 'log-purge',
-                'course_creation': 'log-course_creation'
-            }.get(entry['type'], '')
-            
-            html += f'<div class="log-entry {type_class} small" title="{entry["file"]}"><span class="text-muted">[{entry["time"].strftime("%H:%M:%S")}]</span> {line}</div>'
+            parts.append(f'<div class="log-entry {entry["type_class"]} small" title="{escape(entry["file"])}"><span class="text-muted">[{entry["time"].strftime("%H:%M:%S")}]</span> {escape(line)}</div>')
         
-        html += '</div>'
-        return html
+        parts.append('</div>')
+        return ''.join(parts)
     
+    @staticmethod
+    def _read_tail_lines(path, count, block_size=8192):
+        """Return the last count lines of a file, reading backwards only as far as needed"""
+        with open(path, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            data = b''
+            # One newline more than needed guarantees count whole lines
+            while pos > 0 and data.count(b'\n') <= count:
+                step = min(block_size, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        if pos > 0:
+            data = data[data.index(b'\n') + 1:]  # Drop the partial first line
+        # Decode like text-mode reading so line splitting is unchanged
+        return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').readlines()[-count:]
+
     def generate_dashboard(self):
         """Generate the complete dashboard"""
         print("\n" + "="*60)
         print("📊 Generating Enhanced Enrollment Dashboard")
         print("="*60)
         
-        # Find all logs
-        self.find_all_logs()
+        # One clock read per run, shared by the 24h window, the page and the cache
+        now = datetime.now()
+        
+        # Unchanged logs render the same page; only refresh its timestamps
+        html_file = self.output_dir / 'index.html'
+        signature = self.get_log_signature()
+        if self.refresh_cached_dashboard(html_file, signature, now):
+            print(f"\n♻️  Logs unchanged, reused cached dashboard: {html_file}")
+            print("="*60)
+            return True
         
         # Generate combined metrics
-        combined_metrics = self.generate_combined_metrics()
+        combined_metrics = self.generate_combined_metrics(now)
         
         # Print summary
         print(f"\n📋 System Status: {combined_metrics['system_status'].upper()}")
@@ -584,18 +1018,88 @@ class EnrollmentMonitor:
             print(f"  • {log_type}: {info['count']} files ({info['size_kb']:.0f} KB)")
         
         # Generate HTML
-        html_content = self.generate_html(combined_metrics)
+        with self._stage('html'):
+            html_content = self.generate_html(combined_metrics, now)
+        html_content += self.timings_comment()
         
         # Write to file
-        html_file = self.output_dir / 'index.html'
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        self.write_html(html_file, html_content)
+        self.save_cache(signature, html_content, now)
         
         print(f"\n✅ Dashboard generated: {html_file}")
         print("="*60)
         
         return True
 
+    def write_html(self, html_file, html_content):
+        """Write the page with raw os.write calls, then swap it in atomically"""
+        # Same bytes text mode wrote (platform newlines), encoded once
+        if os.linesep != '\n':
+            html_content = html_content.replace('\n', os.linesep)
+        data = memoryview(html_content.encode('utf-8'))
+        # Viewers never see a half-written dashboard
+        tmp_path = html_file.with_name(html_file.name + '.tmp')
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, html_file)
+
+    def get_log_signature(self):
+        """Identify the current set of logs by path, mtime and size"""
+        return {
+            'log_dirs': [str(d) for d in self.log_dirs],
+            'logs': [[path, info['mtime'].isoformat(), info['size']]
+                     for path, info in self.logs.items()]
+        }
+
+    def refresh_cached_dashboard(self, html_file, signature, now):
+        """Re-emit the cached dashboard if the logs have not changed"""
+        try:
+            with open(self._cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache['signature'] != signature or now.isoformat() >= cache['expires']:
+                return False
+            with open(html_file, 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            if hashlib.sha256(html_content.encode('utf-8')).hexdigest() != cache['html_sha256']:
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+
+        generated = now.strftime('%Y-%m-%d %H:%M:%S')
+        html_content = _RE_GENERATED_AT.sub(lambda m: m.group(1) + generated, html_content)
+        self.write_html(html_file, html_content)
+        cache['html_sha256'] = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+        self._write_json(self._cache_path, cache)
+        return True
+
+    def save_cache(self, signature, html_content, now):
+        """Record the logs a dashboard was rendered from"""
+        # The page changes once a log ages out of the 24h window
+        cutoff_24h = now - timedelta(hours=24)
+        recent = [info['mtime'] for info in self.logs.values() if info['mtime'] > cutoff_24h]
+        expires = min(recent) + timedelta(hours=24) if recent else datetime.max
+        self._write_json(self._cache_path, {
+            'signature': signature,
+            'expires': expires.isoformat(),
+            'html_sha256': hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+        })
+
+    def _write_json(self, path, data):
+        """Atomically write a cache or state file"""
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # One-shot C encoding and a single write, rather than streamed chunks
+                f.write(json.dumps(data, separators=(',', ':')))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write {path.name}: {e}")
+
 
 def main():
     import argparse
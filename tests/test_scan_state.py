@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Regression checks for the resumable sync-log scan in EnrollmentMonitor.parse_log_file
+Run with: python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from enrollment_monitor import EnrollmentMonitor
+
+LINES = [
+    b"2026-01-01 10:00:00 - INFO - Processing: 40 enrolments\n",
+    b"2026-01-01 10:00:01 - INFO - Enrolling user 1001 in FNLT100_SEM1 course\n",
+    b"2026-01-01 10:00:02 - ERROR - Course XYZW999 not found\n",
+    b"2026-01-01 10:00:03 - INFO - Batch 1 (40 enrolments) - Success\n",
+    b"2026-01-01 10:00:04 - ERROR - Moodle API Error: timeout\n",
+    b"2026-01-01 10:00:05 - INFO - Successfully removed 3 enrolments\n",
+    b"2026-01-01 10:00:06 - INFO - Push complete: 37 successful, 3 failed\n",
+]
+
+
+class ScanStateTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.log = self.tmp / 'enrolment_sync.log'
+        self.log.write_bytes(b'')
+        self.monitor = self._monitor('resumed')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _monitor(self, name):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return EnrollmentMonitor(log_dirs=[], output_dir=str(self.tmp / name))
+
+    def _parse(self, monitor):
+        """Parse the log, failing the test if parse_log_file reports an error"""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            metrics = monitor.parse_log_file(self.log)
+        self.assertNotIn('Error parsing log file', output.getvalue())
+        return metrics
+
+    def assertMatchesFullScan(self):
+        """A resumed scan must equal a scan that starts from scratch"""
+        resumed = self._parse(self.monitor)
+        full = self._parse(self._monitor(f'full{id(resumed)}'))
+        self.assertEqual(resumed, full)
+        return resumed
+
+    def test_empty_log_is_parsed_repeatedly(self):
+        for _ in range(3):
+            metrics = self.assertMatchesFullScan()
+            self.assertEqual(metrics['successful'], 0)
+        self.assertTrue(self.monitor._scan_state_path.exists())
+
+    def test_partial_trailing_line_is_rescanned(self):
+        last = LINES[-1]
+        self.log.write_bytes(b''.join(LINES[:-1]) + last[:30])
+        self.assertMatchesFullScan()
+        self.log.write_bytes(b''.join(LINES))
+        metrics = self.assertMatchesFullScan()
+        self.assertEqual((metrics['successful'], metrics['errors']), (37, 3))
+
+    def test_growing_log_resumes(self):
+        for count in range(1, len(LINES) + 1):
+            self.log.write_bytes(b''.join(LINES[:count]))
+            metrics = self.assertMatchesFullScan()
+        self.assertEqual(metrics['api_errors'], 1)
+
+    def test_rotated_log_is_rescanned(self):
+        self.log.write_bytes(b''.join(LINES))
+        self.assertMatchesFullScan()
+        # Rotation: a new file with a different first line takes the old name
+        rotated = self.tmp / 'new.log'
+        rotated.write_bytes(LINES[3] + LINES[0] + LINES[0] + LINES[0])
+        os.replace(rotated, self.log)
+        metrics = self.assertMatchesFullScan()
+        self.assertEqual(metrics['successful'], 0)
+        # Rotation to an empty file, then growth again
+        self.log.write_bytes(b'')
+        self.assertMatchesFullScan()
+        self.log.write_bytes(b''.join(LINES[:2]))
+        self.assertMatchesFullScan()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,30 +3,43 @@
 Automated Enrollment Monitor Update
 Generates dashboard and pushes to GitHub in one command
 """
-import subprocess
+import contextlib
+import io
 import sys
 from pathlib import Path
 
-def run_command(command, cwd=None):
-    """Run a shell command."""
+import deploy_monitor
+from enrollment_monitor import EnrollmentMonitor
+
+def run_step(func, *args):
+    """Run a monitor step in this process; its output is only shown if it fails."""
+    output = io.StringIO()
     try:
-        result = subprocess.run(command, shell=True, cwd=cwd, check=True, capture_output=True, text=True, encoding='utf-8')
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Command failed: {command}")
-        print(f"Error: {e.stderr}")
-        return False
+        with contextlib.redirect_stdout(output):
+            if func(*args):
+                return True
+        print(f"Step failed: {func.__name__}")
+    except Exception as e:
+        print(f"Step failed: {func.__name__}")
+        print(f"Error: {e}")
+    print(output.getvalue(), end='')
+    return False
+
+def generate_dashboard():
+    """Generate the dashboard as `python enrollment_monitor.py` would."""
+    return EnrollmentMonitor().generate_dashboard()
 
 def update_monitor():
     """Update the enrollment monitor dashboard."""
+    # Both steps are Python, so they run here instead of in a shell and a fresh interpreter
     print("Generating dashboard...")
-    success = run_command("python enrollment_monitor.py")
+    success = run_step(generate_dashboard)
     if not success:
         print("Failed to generate dashboard")
         return False
 
     print("Pushing to GitHub...")
-    success = run_command("python deploy_monitor.py update")
+    success = run_step(deploy_monitor.update_and_push)
     if not success:
         print("Failed to push to GitHub")
         return False
@@ -41,7 +54,7 @@ def main():
             return
         repo_url = sys.argv[2]
         print("Setting up monitor...")
-        success = run_command(f"python deploy_monitor.py setup {repo_url}")
+        success = run_step(deploy_monitor.setup_github_repo, repo_url)
         if success:
             print("Setup completed! Monitor will be available at your CloudFlare Pages URL once deployed.")
         else: